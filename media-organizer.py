@@ -1,61 +1,351 @@
+import errno
+import mmap
 import os
 import shutil
+import sqlite3
 import sys
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from PIL import Image # For EXIF data
-from PIL.ExifTags import TAGS # For decoding EXIF tags
+
+IMAGE_EXTENSIONS = frozenset({'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tif', '.tiff', '.heic'})
+VIDEO_EXTENSIONS = frozenset({'.mp4', '.mov', '.avi', '.wmv', '.mkv', '.flv', '.webm'})
+ACCEPTED_EXTENSIONS = IMAGE_EXTENSIONS | VIDEO_EXTENSIONS
+EXIF_CAPABLE_EXTENSIONS = frozenset({'.jpg', '.jpeg', '.tif', '.tiff', '.heic'}) # Formats that carry DateTimeOriginal in practice
+QUICKTIME_EXTENSIONS = frozenset({'.mp4', '.mov'}) # ISO base media files with a 'mvhd' creation time
+
+DATETIME_ORIGINAL_TAG = 36867 # EXIF 'DateTimeOriginal' (0x9003)
+EXIF_IFD_POINTER_TAG = 34665 # Points to the EXIF sub-IFD holding DateTimeOriginal (0x8769)
+EXIF_HEADER_READ_SIZE = 128 * 1024 # JPEG metadata segments live at the start of the file; scan no further
+DATE_CACHE_PATH = os.path.expanduser("~/.media_organizer_cache.db")
+DATE_CACHE_COMMIT_INTERVAL = 500 # Files resolved between cache commits
+MAX_PENDING_LOOKUPS = 256 # Files whose date lookup may be queued or running at once
+LOG_FLUSH_INTERVAL = 100 # Files whose log lines are buffered between writes to stdout
+DATE_CACHE_VERSION = 2 # Bump when date resolution changes so stale cached dates are discarded
+QUICKTIME_EPOCH_OFFSET = 2082844800 # Seconds from 1904-01-01 (QuickTime epoch) to 1970-01-01
+
+# Folder name cleaning in one str.translate pass: ' ', '.' and '-' become '_', and other
+# Latin-1 characters that are not alphanumeric are dropped
+FOLDER_NAME_TABLE = str.maketrans(
+    " .-", "___",
+    "".join(chr(c) for c in range(256) if not (chr(c).isalnum() or chr(c) in " .-_")),
+)
+
+def find_exif_segment(data):
+    """
+    Locates the EXIF payload of a JPEG's APP1 segment within the file header.
+    data is the file contents (e.g. an mmap); only the first EXIF_HEADER_READ_SIZE bytes are scanned.
+    Returns (start, end) offsets, or None if the file is not a JPEG or no EXIF segment is found.
+    """
+    if data[:2] != b'\xff\xd8':
+        return None # Not a JPEG (no SOI marker)
+
+    header_end = min(len(data), EXIF_HEADER_READ_SIZE)
+    offset = 2
+    while offset + 4 <= header_end:
+        if data[offset] != 0xFF:
+            return None # Corrupt marker stream
+        marker = data[offset + 1]
+        if marker == 0xFF:
+            offset += 1 # Fill byte
+            continue
+        if marker in (0xDA, 0xD9):
+            return None # Start of scan / end of image: no more metadata segments
+        segment_length = int.from_bytes(data[offset + 2:offset + 4], 'big')
+        if marker == 0xE1 and data[offset + 4:offset + 10] == b'Exif\x00\x00':
+            return offset + 10, min(offset + 2 + segment_length, len(data))
+        offset += 2 + segment_length
+    return None
+
+def find_datetime_original(exif_segment):
+    """
+    Walks a raw EXIF (TIFF) block straight to DateTimeOriginal, skipping all other tags.
+    Returns the raw "YYYY:MM:DD HH:MM:SS" string, or None if the tag is absent.
+    Raises ValueError if the block is malformed or truncated.
+    """
+    byte_order = {b'II': 'little', b'MM': 'big'}.get(bytes(exif_segment[:2]))
+    if byte_order is None:
+        raise ValueError("Not a TIFF header")
+
+    def read_int(offset, size):
+        if offset + size > len(exif_segment):
+            raise ValueError("EXIF block is truncated")
+        return int.from_bytes(exif_segment[offset:offset + size], byte_order)
+
+    # IFD0 -> EXIF sub-IFD -> DateTimeOriginal. MakerNotes, GPS and the thumbnail IFD are never read.
+    ifd_offset = read_int(4, 4)
+    for wanted_tag in (EXIF_IFD_POINTER_TAG, DATETIME_ORIGINAL_TAG):
+        for index in range(read_int(ifd_offset, 2)):
+            entry_offset = ifd_offset + 2 + index * 12
+            tag = read_int(entry_offset, 2)
+            if tag == wanted_tag:
+                break
+            # No early exit on tag > wanted_tag: some writers produce unsorted IFDs
+        else:
+            return None
+        ifd_offset = read_int(entry_offset + 8, 4) # Offset of the sub-IFD, then of the date string
+
+    value_length = read_int(entry_offset + 4, 4)
+    read_int(ifd_offset, value_length) # Bounds check
+    return bytes(exif_segment[ifd_offset:ifd_offset + value_length]).rstrip(b'\x00').decode('ascii')
+
+def parse_exif_datetime(value):
+    """
+    Parses an EXIF date string. EXIF date format is "YYYY:MM:DD HH:MM:SS".
+    """
+    # Fixed-width fields: slicing is much cheaper than strptime
+    try:
+        return datetime(int(value[0:4]), int(value[5:7]), int(value[8:10]),
+                        int(value[11:13]), int(value[14:16]), int(value[17:19]))
+    except ValueError:
+        return datetime.strptime(value, '%Y:%m:%d %H:%M:%S') # Raises for malformed dates
 
 def get_exif_date(image_path):
     """
     Extracts the 'Date Taken' (DateTimeOriginal) from an image's EXIF data.
     """
+    # Fast path: memory-map the file and parse the EXIF segment straight from the JPEG
+    # header without letting PIL open the image. Only the pages touched are read.
+    try:
+        with open(image_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            segment = find_exif_segment(data)
+            # Copy the segment (at most 64 KB) rather than holding a view on the mapping,
+            # which would stop it from closing if parsing raises
+            exif_segment = data[segment[0]:segment[1]] if segment is not None else None
+        if exif_segment is not None:
+            value = find_datetime_original(exif_segment)
+            return parse_exif_datetime(value) if value else None
+    except Exception as e:
+        pass # Fall back to opening the image with PIL
+
     try:
         with Image.open(image_path) as img:
             exif_data = img._getexif()
             if exif_data:
-                for tag, value in exif_data.items():
-                    tag_name = TAGS.get(tag, tag)
-                    if tag_name == 'DateTimeOriginal':
-                        # EXIF date format is "YYYY:MM:DD HH:MM:SS"
-                        return datetime.strptime(value, '%Y:%m:%d %H:%M:%S')
+                value = exif_data.get(DATETIME_ORIGINAL_TAG)
+                if value:
+                    return parse_exif_datetime(value)
     except Exception as e:
         # print(f"  Warning: Could not read EXIF for {os.path.basename(image_path)}: {e}")
         pass # Ignore errors, fallback to file system date
     return None
 
-def get_file_date(filepath):
+def scan_files(path):
     """
-    Determines the best available date for a file (EXIF, then creation, then modification).
+    Recursively yields (directory, os.DirEntry) for every file under path.
     """
-    # Attempt to get EXIF date for image files
-    if filepath.lower().endswith(('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tif', '.tiff', '.heic')):
-        exif_date = get_exif_date(filepath)
-        if exif_date:
-            return exif_date
+    subdirectories = []
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirectories.append(entry.path)
+                elif entry.is_file():
+                    yield path, entry
+    except OSError as e:
+        # Unreadable or vanished folder: skip it like os.walk does and carry on
+        print(f"  Warning: Could not read folder {path}: {e}")
+        return
+    # Descend after closing this directory's handle to keep open descriptors bounded
+    for subdirectory in subdirectories:
+        yield from scan_files(subdirectory)
+
+def get_video_date(video_path):
+    """
+    Extracts the creation time from an MP4/MOV file's movie header ('mvhd') box.
+    """
+    try:
+        with open(video_path, 'rb') as f:
+            # Hop over top-level boxes (seeking past 'mdat') to 'moov', then over its children to 'mvhd'
+            box_end = os.fstat(f.fileno()).st_size
+            for wanted_type in (b'moov', b'mvhd'):
+                while True:
+                    box_start = f.tell()
+                    header = f.read(8)
+                    if len(header) < 8 or box_start + 8 > box_end:
+                        return None
+                    box_size = int.from_bytes(header[:4], 'big')
+                    header_size = 8
+                    if box_size == 1: # 64-bit size follows the type
+                        box_size = int.from_bytes(f.read(8), 'big')
+                        header_size = 16
+                    elif box_size == 0: # Box extends to the end of its parent
+                        box_size = box_end - box_start
+                    if box_size < header_size:
+                        return None # Corrupt box
+                    if header[4:8] == wanted_type:
+                        break
+                    f.seek(box_start + box_size)
+                box_end = box_start + box_size
+
+            version = f.read(4)[0] # Version byte followed by 3 bytes of flags
+            creation_time = int.from_bytes(f.read(8 if version == 1 else 4), 'big')
+            if creation_time > QUICKTIME_EPOCH_OFFSET: # Many encoders leave it as 0
+                return datetime.fromtimestamp(creation_time - QUICKTIME_EPOCH_OFFSET)
+    except Exception as e:
+        # print(f"  Warning: Could not read movie header for {os.path.basename(video_path)}: {e}")
+        pass # Ignore errors, fallback to file system date
+    return None
 
-    # Fallback to creation time for all files if EXIF fails or not an image
+def get_file_date(entry, file_extension):
+    """
+    Determines the best available date for a file (EXIF or movie header, then creation, then modification).
+    file_extension is the entry's lowercased extension, e.g. ".jpg".
+    """
+    filepath = entry.path
+
+    # Attempt to get the embedded capture date. PNG/GIF/BMP rarely carry EXIF, so
+    # they go straight to the file system date instead of paying for a PIL open.
+    embedded_date = None
+    if file_extension in EXIF_CAPABLE_EXTENSIONS:
+        embedded_date = get_exif_date(filepath)
+    elif file_extension in QUICKTIME_EXTENSIONS:
+        embedded_date = get_video_date(filepath)
+    if embedded_date:
+        return embedded_date
+
+    # Fallback to creation time for all files if there is no embedded date.
+    # DirEntry caches its stat result, so this is at most one stat per file.
+    file_stat = entry.stat()
     try:
-        # On Windows, os.path.getctime returns creation time
-        # On Unix, it returns last metadata change time (often creation time on Linux)
-        return datetime.fromtimestamp(os.path.getctime(filepath))
+        # On Windows, st_ctime is the creation time
+        # On Unix, it is the last metadata change time (often creation time on Linux)
+        return datetime.fromtimestamp(file_stat.st_ctime)
     except Exception as e:
         # Fallback to modification time
         # print(f"  Warning: Could not get creation time for {os.path.basename(filepath)}: {e}")
-        return datetime.fromtimestamp(os.path.getmtime(filepath))
+        return datetime.fromtimestamp(file_stat.st_mtime)
 
-def organize_files(source_path, destination_path, what_if=False):
+def open_date_cache(cache_path=DATE_CACHE_PATH):
     """
-    Organizes photos and videos from source_path to destination_path by date.
+    Opens the on-disk cache of resolved file dates, creating it if needed.
+    Returns None if the cache cannot be opened.
+    """
+    try:
+        cache = sqlite3.connect(cache_path)
+        if cache.execute("PRAGMA user_version").fetchone()[0] != DATE_CACHE_VERSION:
+            # Written by an older version that resolved dates differently
+            cache.execute("DROP TABLE IF EXISTS file_dates")
+            cache.execute(f"PRAGMA user_version = {DATE_CACHE_VERSION}")
+        cache.execute(
+            "CREATE TABLE IF NOT EXISTS file_dates "
+            "(path TEXT PRIMARY KEY, mtime INTEGER, size INTEGER, date TEXT)"
+        )
+        return cache
+    except sqlite3.Error as e:
+        print(f"  Warning: Could not open date cache at {cache_path}: {e}")
+        return None
+
+def get_cached_date(cache, entry):
+    """
+    Returns the cached date for a file, or None if it is missing or the file changed since.
+    """
+    try:
+        file_stat = entry.stat()
+        row = cache.execute(
+            "SELECT date FROM file_dates WHERE path = ? AND mtime = ? AND size = ?",
+            (os.path.abspath(entry.path), file_stat.st_mtime_ns, file_stat.st_size),
+        ).fetchone()
+        return datetime.fromisoformat(row[0]) if row else None
+    except (OSError, ValueError, TypeError, sqlite3.Error):
+        return None # Unreadable or corrupt entry: treat as a cache miss
+
+def store_cached_date(cache, entry, determined_date):
+    """
+    Records the resolved date for a file, replacing any stale entry for the same path.
     """
-    image_extensions = ('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tif', '.tiff', '.heic')
-    video_extensions = ('.mp4', '.mov', '.avi', '.wmv', '.mkv', '.flv', '.webm')
-    accepted_extensions = image_extensions + video_extensions
+    file_stat = entry.stat()
+    cache.execute(
+        "INSERT OR REPLACE INTO file_dates (path, mtime, size, date) VALUES (?, ?, ?, ?)",
+        (os.path.abspath(entry.path), file_stat.st_mtime_ns, file_stat.st_size, determined_date.isoformat()),
+    )
 
-    month_names = [
-        "01", "02", "03", "04", "05", "06",
-        "07", "08", "09", "10", "11", "12"
-    ]
+def forget_cached_date(cache, entry):
+    """
+    Drops the cached date for a file that has been moved away; its path can never match again.
+    """
+    cache.execute("DELETE FROM file_dates WHERE path = ?", (os.path.abspath(entry.path),))
+
+def disable_date_cache(cache, error):
+    """
+    Warns that the date cache could not be updated and closes it. Returns None so callers
+    can write `cache = disable_date_cache(cache, e)` and carry on without it.
+    """
+    print(f"  Warning: Could not update date cache, continuing without it: {error}")
+    try:
+        cache.close()
+    except sqlite3.Error:
+        pass
+    return None
+
+def get_folder_name_prefix(folder_path, source_path):
+    """
+    Builds the filename prefix from a folder's path relative to the source, e.g. "_Family_Birthday".
+    """
+    relative_folder_path = os.path.relpath(folder_path, source_path)
 
+    if relative_folder_path == '.':
+        folder_name_parts = []
+    else:
+        folder_name_parts = relative_folder_path.split(os.sep)
+    cleaned_folder_names = []
+    for part in folder_name_parts:
+        cleaned_part = part.translate(FOLDER_NAME_TABLE)
+        if not cleaned_part.isascii():
+            # The table only covers Latin-1; filter any other characters individually
+            cleaned_part = ''.join(c for c in cleaned_part if c.isalnum() or c == '_') # Keep only alphanumeric and underscore
+        if cleaned_part: # Ensure part is not empty after cleaning
+            cleaned_folder_names.append(cleaned_part)
+
+    # Join them with underscores for the filename prefix
+    if not cleaned_folder_names:
+        return ""
+    return "_" + "_".join(cleaned_folder_names)
+
+def move_file(source_file, destination_file, same_device):
+    """
+    Moves a file without overwriting an existing destination, copying it explicitly
+    when source and destination are on different devices.
+    Raises FileExistsError if destination_file already exists.
+    """
+    if same_device:
+        # Hard link then unlink: like a rename no file data is copied, but os.link refuses
+        # to replace a file that appeared after the folder was listed (e.g. by another run)
+        try:
+            os.link(source_file, destination_file)
+        except FileExistsError:
+            raise
+        except OSError:
+            # Hard links unsupported (e.g. FAT/exFAT, some network shares)
+            if os.path.exists(destination_file):
+                raise FileExistsError(errno.EEXIST, "Destination already exists", destination_file)
+            os.rename(source_file, destination_file)
+        else:
+            try:
+                os.unlink(source_file)
+            except OSError:
+                # Undo the link so a failed move leaves the file only in the source
+                os.unlink(destination_file)
+                raise
+    else:
+        if os.path.exists(destination_file):
+            raise FileExistsError(errno.EEXIST, "Destination already exists", destination_file)
+        # copy2 goes through shutil.copyfile (sendfile/copy_file_range on Linux) and
+        # keeps the timestamps the date fallback relies on
+        try:
+            shutil.copy2(source_file, destination_file)
+            os.unlink(source_file)
+        except BaseException:
+            # Remove a partial or duplicate copy so a failed move leaves the file only in the source
+            if os.path.exists(destination_file) and os.path.exists(source_file):
+                os.unlink(destination_file)
+            raise
+
+def organize_files(source_path, destination_path, what_if=False, use_cache=True, assume_yes=False):
+    """
+    Organizes photos and videos from source_path to destination_path by date.
+    """
     processed_count = 0
     skipped_count = 0
     error_count = 0
@@ -66,6 +356,11 @@ def organize_files(source_path, destination_path, what_if=False):
 
     if what_if:
         print("\n*** RUNNING IN WHAT-IF MODE (NO CHANGES WILL BE MADE) ***\n")
+    elif assume_yes:
+        print("\nMoving files without confirmation (--yes).")
+    elif not sys.stdin.isatty():
+        # Nobody can answer the prompt (cron, pipes, CI); don't block on a hidden input()
+        sys.exit("Refusing to move files non-interactively without --yes.") # Printed to stderr
     else:
         confirm = input("\nThis script will MOVE files. Are you sure you want to proceed? (yes/no): ").lower()
         if confirm != 'yes':
@@ -75,84 +370,173 @@ def organize_files(source_path, destination_path, what_if=False):
     # Ensure destination path exists
     os.makedirs(destination_path, exist_ok=True)
 
+    # Moves across filesystems copy every byte instead of renaming; warn up front
+    destination_device = os.stat(destination_path).st_dev
+    if os.stat(source_path).st_dev != destination_device:
+        print("\n  Warning: Source and destination are on different drives/filesystems.")
+        print("  Files will be copied and then deleted from the source, which can be slow for large videos.")
+
     print("\nStarting file organization...")
 
     normalized_source_path = os.path.normpath(source_path)
 
-    for root, _, files in os.walk(source_path):
-        for filename in files:
-            file_extension = os.path.splitext(filename)[1].lower()
-            if file_extension not in accepted_extensions:
+    # Destination paths are built with f-strings in the loop rather than os.path.join
+    sep = os.sep
+    destination_root = os.path.normpath(destination_path).rstrip(sep)
+
+    # The date cache is only touched from the main thread since sqlite connections are per-thread
+    cache = open_date_cache() if use_cache else None
+    uncached_count = 0
+    folder_prefixes = {} # Source folder -> filename prefix
+    buckets = defaultdict(list) # (year, month) -> files to move into that month folder
+    # Walked files whose date lookup may still be running, oldest first
+    pending = deque()
+
+    def collect_oldest():
+        """
+        Phase 2: takes the oldest pending file's resolved date and files it under its destination month.
+        """
+        nonlocal cache, uncached_count, error_count
+        root, entry, base_name, file_extension, date_source = pending.popleft()
+        try:
+            if isinstance(date_source, datetime):
+                determined_date = date_source
+            else:
+                determined_date = date_source.result()
+        except Exception as e:
+            print(f"  ERROR processing {entry.name}: {e}")
+            error_count += 1
+            return
+
+        # A cache write failure (e.g. another run holding the lock) must not stop the move
+        if cache and determined_date and not isinstance(date_source, datetime):
+            try:
+                store_cached_date(cache, entry, determined_date)
+                uncached_count += 1
+                if uncached_count % DATE_CACHE_COMMIT_INTERVAL == 0:
+                    cache.commit()
+            except sqlite3.Error as e:
+                cache = disable_date_cache(cache, e)
+
+        if not determined_date:
+            print(f"  Warning: Could not determine date for {entry.name}. Skipping.")
+            error_count += 1
+            return
+
+        buckets[(determined_date.year, determined_date.month)].append(
+            (root, entry, base_name, file_extension, determined_date)
+        )
+
+    executor = ThreadPoolExecutor()
+    try:
+        # Phase 1: walk the source tree and queue each file's date lookup as soon as the file
+        # is found, so header reads overlap with the rest of the traversal. Threads rather than
+        # processes: the work is mostly file I/O (PIL releases the GIL while reading) and
+        # nothing has to be pickled. Dates already in the on-disk cache are not re-read.
+        # At most MAX_PENDING_LOOKUPS files are in flight, which bounds memory on large trees.
+        for root, entry in scan_files(source_path):
+            # Split the name once; the base name is reused for the new filename
+            dot_index = entry.name.rfind('.')
+            file_extension = entry.name[dot_index:].lower() if dot_index > 0 else ''
+            if file_extension not in ACCEPTED_EXTENSIONS:
                 skipped_count += 1
                 continue # Skip non-photo/video files
 
-            original_filepath = os.path.join(root, filename)
-
-            try:
-                determined_date = get_file_date(original_filepath)
-
-                if not determined_date:
-                    print(f"  Warning: Could not determine date for {filename}. Skipping.")
-                    error_count += 1
-                    continue
-                
-                relative_folder_path = os.path.relpath(root, normalized_source_path)
-
-                if relative_folder_path == '.':
-                    folder_name_parts = []
-                else:
-                    folder_name_parts = relative_folder_path.split(os.sep)
-                cleaned_folder_names = []
-                for part in folder_name_parts:
-                    cleaned_part = part.replace(' ', '_').replace('.', '_').replace('-', '_')
-                    cleaned_part = ''.join(c for c in cleaned_part if c.isalnum() or c == '_') # Keep only alphanumeric and underscore
-                    if cleaned_part: # Ensure part is not empty after cleaning
-                        cleaned_folder_names.append(cleaned_part)
-
-                # Join them with underscores for the filename prefix
-                folder_name_prefix = ""
-                if cleaned_folder_names:
-                    folder_name_prefix = "_" + "_".join(cleaned_folder_names) # e.g., "_Family_Birthday"
-
-
-                year = determined_date.strftime("%Y")
-                month_num = determined_date.month # 1-12
-                month_name = month_names[month_num - 1] # 0-indexed array
-                formatted_date_for_file = determined_date.strftime("%Y_%m_%d")
-
-                year_folder_path = os.path.join(destination_path, year)
-                month_folder_path = os.path.join(year_folder_path, f"{year}_{month_name}")
-
-                # Prepare new filename with original basename
-                base_name = os.path.splitext(filename)[0]
-                new_filename_base = f"{formatted_date_for_file}{folder_name_prefix}_{base_name}"
-                new_filename = f"{new_filename_base}{file_extension}"
-
-                destination_file_path = os.path.join(month_folder_path, new_filename)
-
-                # Handle duplicates
-                counter = 1
-                while os.path.exists(destination_file_path):
-                    new_filename = f"{new_filename_base}_{counter}{file_extension}"
-                    destination_file_path = os.path.join(month_folder_path, new_filename)
-                    counter += 1
-
-                print(f"\nProcessing: {filename}")
-                print(f"  Detected Date: {determined_date.strftime('%Y-%m-%d %H:%M:%S')}")
-                print(f"  Moving to: {destination_file_path}")
-
+            cached_date = get_cached_date(cache, entry) if cache else None
+            date_source = cached_date or executor.submit(get_file_date, entry, file_extension)
+            pending.append((root, entry, entry.name[:dot_index], file_extension, date_source))
+            if len(pending) >= MAX_PENDING_LOOKUPS:
+                collect_oldest()
+
+        while pending:
+            collect_oldest()
+    except BaseException:
+        # On Ctrl-C or a crash, drop queued lookups instead of waiting for all of them
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    executor.shutdown()
+
+    # Phase 3: move files one month folder at a time on the main thread, so each folder is
+    # created and listed once and the duplicate counter never races
+    for (year, month), bucket in sorted(buckets.items()):
+        month_folder_path = f"{destination_root}{sep}{year:04d}{sep}{year:04d}_{month:02d}"
+
+        try:
+            if os.path.isdir(month_folder_path):
+                existing_names = os.listdir(month_folder_path)
+            else:
+                existing_names = []
                 if not what_if:
-                    os.makedirs(year_folder_path, exist_ok=True)
-                    os.makedirs(month_folder_path, exist_ok=True)
-                    shutil.move(original_filepath, destination_file_path)
-                    processed_count += 1
-                    print(f"  SUCCESS: Moved and renamed '{filename}' to '{new_filename}'")
-                else:
-                    print(f"  WHAT-IF: Would move and rename '{filename}' to '{destination_file_path}'")
+                    os.makedirs(month_folder_path) # Also creates the year folder
+        except Exception as e:
+            print(f"  ERROR creating folder {month_folder_path}: {e}")
+            error_count += len(bucket)
+            continue
+        # Names already in (or headed for) this folder, for duplicate handling. Compared
+        # case-insensitively everywhere: macOS and Windows filesystems usually are, and an
+        # extra "_1" on a case-sensitive one is harmless where overwriting a photo is not.
+        folder_names = {name.casefold() for name in existing_names}
+        output = [] # Per-file log lines, written in batches
+        try:
+            for index, (root, entry, base_name, file_extension, determined_date) in enumerate(bucket, 1):
+                filename = entry.name
+                original_filepath = entry.path
+                try:
+                    # The prefix only depends on the source folder, so build it once per folder
+                    folder_name_prefix = folder_prefixes.get(root)
+                    if folder_name_prefix is None:
+                        folder_name_prefix = folder_prefixes[root] = get_folder_name_prefix(root, normalized_source_path)
+
+                    formatted_date_for_file = determined_date.strftime("%Y_%m_%d")
+
+                    # Prepare new filename with original basename
+                    new_filename_base = f"{formatted_date_for_file}{folder_name_prefix}_{base_name}"
+                    new_filename = f"{new_filename_base}{file_extension}"
+
+                    # Handle duplicates
+                    counter = 1
+                    while new_filename.casefold() in folder_names:
+                        new_filename = f"{new_filename_base}_{counter}{file_extension}"
+                        counter += 1
+                    folder_names.add(new_filename.casefold())
+                    destination_file_path = f"{month_folder_path}{sep}{new_filename}"
+
+                    output.append(f"\nProcessing: {filename}\n")
+                    output.append(f"  Detected Date: {determined_date.strftime('%Y-%m-%d %H:%M:%S')}\n")
+                    output.append(f"  Moving to: {destination_file_path}\n")
+
+                    if not what_if:
+                        move_file(original_filepath, destination_file_path, entry.stat().st_dev == destination_device)
+                        processed_count += 1
+                        # Only what-if runs and failed moves keep their cache rows
+                        if cache:
+                            try:
+                                forget_cached_date(cache, entry)
+                            except sqlite3.Error as e:
+                                cache = disable_date_cache(cache, e)
+                        output.append(f"  SUCCESS: Moved and renamed '{filename}' to '{new_filename}'\n")
+                    else:
+                        output.append(f"  WHAT-IF: Would move and rename '{filename}' to '{destination_file_path}'\n")
+
+                except Exception as e:
+                    output.append(f"  ERROR processing {filename}: {e}\n")
+                    error_count += 1
 
-            except Exception as e:
-                print(f"  ERROR processing {filename}: {e}")
-                error_count += 1
+                if index % LOG_FLUSH_INTERVAL == 0:
+                    sys.stdout.write("".join(output))
+                    sys.stdout.flush()
+                    output.clear()
+        finally:
+            # Also runs on Ctrl-C or a crash, so every file already moved gets its log lines
+            sys.stdout.write("".join(output))
+            sys.stdout.flush()
+
+    if cache:
+        try:
+            cache.commit()
+            cache.close()
+        except sqlite3.Error as e:
+            disable_date_cache(cache, e)
 
     print("\n--- Script Finished ---")
     print(f"Files Processed: {processed_count}")
@@ -169,6 +553,8 @@ if __name__ == "__main__":
     parser.add_argument("-s", "--source", help="The source directory to scan for photos and videos.")
     parser.add_argument("-d", "--destination", help="The destination directory where organized files will be moved.")
     parser.add_argument("-w", "--what-if", action="store_true", help="Perform a dry run without making changes.")
+    parser.add_argument("-y", "--yes", action="store_true", help="Move files without asking for confirmation (required when not run from a terminal).")
+    parser.add_argument("--no-cache", action="store_true", help=f"Do not read or update the file date cache ({DATE_CACHE_PATH}).")
     args = parser.parse_args()
 
     source_path = args.source
@@ -200,4 +586,4 @@ if __name__ == "__main__":
                     destination_path = None # Reset to re-prompt
 
 
-    organize_files(source_path, destination_path, what_if)
\ No newline at end of file
+    organize_files(source_path, destination_path, what_if, use_cache=not args.no_cache, assume_yes=args.yes)
\ No newline at end of file